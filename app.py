@@ -1,45 +1,228 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, session, flash
+from flask_compress import Compress
+import orjson
 import pandas as pd
+import numpy as np
+import copy
 import json
 import os
+import sys
+import tempfile
+import threading
+import uuid
+from collections import namedtuple
 from datetime import datetime
+from functools import lru_cache, partial
 from werkzeug.utils import secure_filename
-from utils.risk_calculator import RiskCalculator
+from utils.risk_calculator import RiskCalculator, RISK_INPUT_COLUMNS
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'
+except ImportError:
+    # Default C parser when pyarrow is not installed
+    CSV_ENGINE = 'c'
 
 app = Flask(__name__)
 app.secret_key = 'sih_demo_key_2024'  # Demo only - use secure key in production
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Gzip JSON responses
+Compress(app)
+
 # Initialize risk calculator
 risk_calc = RiskCalculator()
 
-# Global variable to store student data (in production, use proper database)
-students_data = None
+# Snapshot of the loaded student data (in production, use proper database):
+#   data    - DataFrame with precomputed risk columns, used for output formatting
+#   arrays  - plain NumPy arrays of the risk inputs and results (structure of
+#             arrays) for the numeric work, free of pandas indexing overhead
+#   by_id   - row position of each student_id for O(1) detail lookups
+#   version - bumped whenever the data is replaced
+#   token   - random ID of this load, unique across processes and restarts
+#   detail  - memoized detail payload builder bound to this snapshot's rows
+# Snapshots are never mutated; a reload swaps in a new one, so concurrent
+# requests always see a consistent set of the fields above.
+StudentDataset = namedtuple('StudentDataset', ['data', 'arrays', 'by_id', 'version', 'token', 'detail'])
+students = None
+_students_lock = threading.Lock()
+
+def json_response(obj, status=200):
+    """Serialize obj with orjson, passing NumPy values through natively"""
+    return Response(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+# Fields returned for each student by /api/students
+STUDENT_LIST_COLUMNS = [
+    'student_id', 'first_name', 'last_name', 'class', 'roll_no',
+    'attendance_percent', 'fees_due_days', 'last_3_tests_avg',
+    'risk_score', 'risk_level', 'risk_color'
+]
+
+def _risk_arrays(df):
+    """Risk inputs of df as NumPy arrays plus the computed risk results"""
+    # to_numpy() on the parsed numeric columns returns views, not copies
+    arrays = {col: df[col].to_numpy() for col in RISK_INPUT_COLUMNS if col in df}
+    
+    # Whole-number columns left as float64 are scored truncated, matching the
+    # int() cast the detail view applies; the arrays keep the uploaded values
+    inputs = dict(arrays)
+    for col in INT_COLUMNS:
+        if col in inputs and inputs[col].dtype.kind == 'f':
+            inputs[col] = np.trunc(inputs[col])
+    arrays.update(risk_calc.calculate_risk_vectorized(inputs))
+    # Round with Python's round(), as calculate_detailed_risk does, so the
+    # list and the detail view always show the same score; np.round's
+    # scale-and-round differs on values such as 0.2345
+    arrays['risk_score'] = np.array([round(score, 3) for score in arrays['risk_score'].tolist()])
+    
+    # A blank whole-number cell keeps its column as float64 with NaN; those
+    # rows fall back to the safe defaults calculate_risk uses when a field
+    # cannot be cast to int
+    missing = np.zeros(len(df), dtype=bool)
+    for col in INT_COLUMNS:
+        if col in arrays and arrays[col].dtype.kind == 'f':
+            missing |= np.isnan(arrays[col])
+    if missing.any():
+        arrays['risk_score'][missing] = 0.0
+        arrays['risk_level'][missing] = 'Low'
+        arrays['risk_color'][missing] = risk_calc.colors['Low']
+    return arrays
+
+def _attach_risk_columns(df, arrays):
+    """Return df with the precomputed risk_score, risk_level and risk_color columns"""
+    return df.assign(
+        risk_score=arrays['risk_score'],
+        risk_level=pd.Categorical(arrays['risk_level'], categories=['Low', 'Medium', 'High']),
+        risk_color=pd.Categorical(arrays['risk_color'])
+    )
+
+def set_students_data(df):
+    """Replace the loaded student data, computing risk once for every student"""
+    global students
+    arrays = _risk_arrays(df)
+    data = _attach_risk_columns(df, arrays)
+    
+    # Point the input arrays at the stored frame's columns: no Arrow or other
+    # second copy is kept, and without copy-on-write assign() copies, so
+    # views of df would keep the parsed frame alive alongside data
+    arrays.update({col: data[col].to_numpy() for col in RISK_INPUT_COLUMNS if col in data})
+    
+    # Duplicate IDs resolve to their first row
+    by_id = {}
+    for pos, student_id in enumerate(df['student_id']):
+        by_id.setdefault(student_id, pos)
+    
+    # The memo lives and dies with the snapshot, so a reload can never build
+    # from, or cache under, another dataset's rows
+    detail = lru_cache(maxsize=1024)(partial(_build_student_detail, data, by_id))
+    
+    with _students_lock:
+        version = students.version + 1 if students is not None else 1
+        students = StudentDataset(data, arrays, by_id, version, uuid.uuid4().hex, detail)
+
+# Explicit schema for the known columns of the student CSV
+CSV_DTYPES = {
+    'student_id': 'string',
+    'first_name': 'string',
+    'last_name': 'string',
+    'attendance_percent': 'float64',
+    'fees_due_days': 'float64',
+    'attempts_in_subject_X': 'float64',
+    'last_3_tests_avg': 'float64',
+    'previous_3_tests_avg': 'float64'
+}
+
+# Whole-number columns are parsed as float64 so blank cells survive as NaN,
+# then narrowed to int32 once they are known to be complete, integral and
+# in range
+INT_COLUMNS = ['fees_due_days', 'attempts_in_subject_X']
+INT_RANGE = np.iinfo(np.int32)
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = ['class', 'first_name', 'last_name']
+
+def read_students_csv(source):
+    """Read a student CSV with the explicit schema and compact dtypes"""
+    df = pd.read_csv(source, engine=CSV_ENGINE, dtype=CSV_DTYPES)
+    for col in INT_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        present = values.dropna()
+        if ((present < INT_RANGE.min) | (present > INT_RANGE.max)).any():
+            raise ValueError(
+                f"Column '{col}' has values outside {INT_RANGE.min} to {INT_RANGE.max}"
+            )
+        # Fractional values stay float64 so they display as uploaded
+        if len(present) == len(values) and (present == np.floor(present)).all():
+            df[col] = values.astype('int32')
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
 
 def load_sample_data():
     """Load sample student data from CSV"""
-    global students_data
     try:
-        students_data = pd.read_csv('data/students_sample.csv')
+        set_students_data(read_students_csv('data/students_sample.csv'))
         return True
     except FileNotFoundError:
         return False
+    except ValueError as e:
+        # A malformed sample must not break the dashboard or a worker boot
+        app.logger.warning(f'Invalid sample data: {str(e)}')
+        return False
+
+# In-memory copy of the notes file, refreshed when its mtime changes
+# The returned dict is shared and must not be mutated; writers build a new
+# one under _notes_lock and pass it to save_student_notes
+NOTES_FILE = 'data/student_notes.json'
+_notes_cache = {'mtime': None, 'data': {}}
+_notes_lock = threading.RLock()
 
 def load_student_notes():
     """Load student intervention notes from JSON file"""
-    notes_file = 'data/student_notes.json'
-    if os.path.exists(notes_file):
-        with open(notes_file, 'r') as f:
-            return json.load(f)
-    return {}
+    with _notes_lock:
+        try:
+            mtime = os.stat(NOTES_FILE).st_mtime_ns
+        except FileNotFoundError:
+            if _notes_cache['mtime'] is not None:
+                _notes_cache['mtime'] = None
+                _notes_cache['data'] = {}
+            return _notes_cache['data']
+        
+        if mtime != _notes_cache['mtime']:
+            with open(NOTES_FILE, 'r') as f:
+                _notes_cache['data'] = json.load(f)
+            _notes_cache['mtime'] = mtime
+        return _notes_cache['data']
 
 def save_student_notes(notes):
     """Save student intervention notes to JSON file"""
-    notes_file = 'data/student_notes.json'
-    os.makedirs('data', exist_ok=True)
-    with open(notes_file, 'w') as f:
-        json.dump(notes, f, indent=2)
+    notes_dir = os.path.dirname(NOTES_FILE)
+    os.makedirs(notes_dir, exist_ok=True)
+    with _notes_lock:
+        # Unique temp file in the same directory, then an atomic rename so
+        # readers never see a partially written file
+        fd, tmp_file = tempfile.mkstemp(dir=notes_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(notes, f, indent=2)
+            os.chmod(tmp_file, 0o644)
+            os.replace(tmp_file, NOTES_FILE)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        
+        # Only reflect the notes in memory once they are on disk
+        _notes_cache['data'] = notes
+        _notes_cache['mtime'] = os.stat(NOTES_FILE).st_mtime_ns
 
 @app.route('/')
 def index():
@@ -84,9 +267,9 @@ def dashboard():
         return redirect(url_for('login'))
     
     # Load sample data if not already loaded
-    if students_data is None:
+    if students is None:
         if not load_sample_data():
-            flash('Sample data not found. Please upload a CSV file.', 'warning')
+            flash('Sample data not found or invalid. Please upload a CSV file.', 'warning')
     
     return render_template('dashboard.html')
 
@@ -101,8 +284,6 @@ def admin():
 @app.route('/api/upload-csv', methods=['POST'])
 def upload_csv():
     """Upload and process CSV file"""
-    global students_data
-    
     if 'user_id' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
@@ -116,20 +297,22 @@ def upload_csv():
     if file and file.filename.lower().endswith('.csv'):
         try:
             # Read CSV directly from memory
-            students_data = pd.read_csv(file)
+            uploaded_data = read_students_csv(file)
             
             # Validate required columns
             required_cols = ['student_id', 'first_name', 'last_name', 'attendance_percent', 
                            'fees_due_days', 'attempts_in_subject_X', 'last_3_tests_avg', 'previous_3_tests_avg']
-            missing_cols = [col for col in required_cols if col not in students_data.columns]
+            missing_cols = [col for col in required_cols if col not in uploaded_data.columns]
             
             if missing_cols:
                 return jsonify({'error': f'Missing columns: {", ".join(missing_cols)}'}), 400
             
+            set_students_data(uploaded_data)
+            
             return jsonify({
                 'message': 'CSV uploaded successfully',
-                'student_count': len(students_data),
-                'columns': list(students_data.columns)
+                'student_count': len(uploaded_data),
+                'columns': list(uploaded_data.columns)
             })
             
         except Exception as e:
@@ -146,100 +329,108 @@ def load_sample():
     if load_sample_data():
         return jsonify({
             'message': 'Sample data loaded successfully',
-            'student_count': len(students_data)
+            'student_count': len(students.data)
         })
     else:
-        return jsonify({'error': 'Sample data file not found'}), 404
+        return jsonify({'error': 'Sample data file not found or invalid'}), 404
 
 @app.route('/api/students')
 def get_students():
-    """Get all students with computed risk scores"""
+    """Get students with computed risk scores, optionally paged via ?limit=&offset="""
     if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
+        return json_response({'error': 'Unauthorized'}, 401)
     
-    global students_data
-    if students_data is None:
-        return jsonify({'error': 'No student data loaded'}), 400
+    dataset = students
+    if dataset is None:
+        return json_response({'error': 'No student data loaded'}, 400)
+    students_data = dataset.data
+    
+    # No limit returns every student from offset onwards
+    limit = request.args.get('limit', type=int)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    if limit is not None:
+        limit = max(limit, 0)
+    
+    # Risk only changes when data is reloaded, so let the browser revalidate
+    # against the data token instead of re-downloading the payload; the
+    # version restarts in every process, so it cannot identify the data
+    etag = f'students-{dataset.token}-{offset}-{limit}'
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     
     try:
-        # Calculate risk for all students
-        students_with_risk = []
-        for _, row in students_data.iterrows():
-            risk_result = risk_calc.calculate_risk(row.to_dict())
-            student_info = {
-                'student_id': row['student_id'],
-                'first_name': row['first_name'],
-                'last_name': row['last_name'],
-                'class': row.get('class', 'N/A'),
-                'roll_no': row.get('roll_no', 'N/A'),
-                'attendance_percent': row['attendance_percent'],
-                'fees_due_days': row['fees_due_days'],
-                'last_3_tests_avg': row['last_3_tests_avg'],
-                'risk_score': round(risk_result['risk_score'], 3),
-                'risk_level': risk_result['risk_level'],
-                'risk_color': risk_result['risk_color']
-            }
-            students_with_risk.append(student_info)
+        # Sort by risk score (highest first) on the plain score array, keeping
+        # file order among equal scores, then only format the requested page
+        order = np.argsort(-dataset.arrays['risk_score'], kind='stable')
+        end = offset + limit if limit is not None else None
+        page = students_data.take(order[offset:end]).assign(
+            **{col: 'N/A' for col in ['class', 'roll_no'] if col not in students_data}
+        )[STUDENT_LIST_COLUMNS]
         
-        # Sort by risk score (highest first)
-        students_with_risk.sort(key=lambda x: x['risk_score'], reverse=True)
-        
-        return jsonify({
-            'students': students_with_risk,
-            'total_count': len(students_with_risk)
+        response = json_response({
+            'students': page.to_dict(orient='records'),
+            'total_count': len(students_data),
+            'offset': offset,
+            'limit': limit
         })
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
-        return jsonify({'error': f'Error calculating risks: {str(e)}'}), 500
+        return json_response({'error': f'Error calculating risks: {str(e)}'}, 500)
+
+def _build_student_detail(data, by_id, student_id):
+    """Detail payload for a student from one snapshot's rows, without notes"""
+    student = data.iloc[by_id[student_id]].to_dict()
+    
+    # Calculate detailed risk analysis
+    risk_result = risk_calc.calculate_detailed_risk(student)
+    
+    return {
+        'student_id': student['student_id'],
+        'first_name': student['first_name'],
+        'last_name': student['last_name'],
+        'class': student.get('class', 'N/A'),
+        'roll_no': student.get('roll_no', 'N/A'),
+        'attendance_percent': student['attendance_percent'],
+        'fees_due_days': student['fees_due_days'],
+        'attempts_in_subject_X': student['attempts_in_subject_X'],
+        'last_test_1': student.get('last_test_1', 0),
+        'last_test_2': student.get('last_test_2', 0),
+        'last_test_3': student.get('last_test_3', 0),
+        'last_3_tests_avg': student['last_3_tests_avg'],
+        'previous_3_tests_avg': student['previous_3_tests_avg'],
+        'risk_analysis': risk_result
+    }
 
 @app.route('/api/student/<student_id>')
 def get_student_detail(student_id):
     """Get detailed student information with risk analysis"""
     if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
+        return json_response({'error': 'Unauthorized'}, 401)
     
-    global students_data
-    if students_data is None:
-        return jsonify({'error': 'No student data loaded'}), 400
+    dataset = students
+    if dataset is None:
+        return json_response({'error': 'No student data loaded'}, 400)
     
     try:
         # Find student
-        student_row = students_data[students_data['student_id'] == student_id]
-        if student_row.empty:
-            return jsonify({'error': 'Student not found'}), 404
-        
-        student = student_row.iloc[0].to_dict()
-        
-        # Calculate detailed risk analysis
-        risk_result = risk_calc.calculate_detailed_risk(student)
+        if student_id not in dataset.by_id:
+            return json_response({'error': 'Student not found'}, 404)
         
-        # Load intervention notes
+        # Memoized per snapshot; notes change independently of the data, so
+        # they are attached fresh from the dict loaded for this request
+        response = dict(dataset.detail(student_id))
         notes = load_student_notes()
-        student_notes = notes.get(student_id, [])
-        
-        # Prepare response
-        response = {
-            'student_id': student['student_id'],
-            'first_name': student['first_name'],
-            'last_name': student['last_name'],
-            'class': student.get('class', 'N/A'),
-            'roll_no': student.get('roll_no', 'N/A'),
-            'attendance_percent': student['attendance_percent'],
-            'fees_due_days': student['fees_due_days'],
-            'attempts_in_subject_X': student['attempts_in_subject_X'],
-            'last_test_1': student.get('last_test_1', 0),
-            'last_test_2': student.get('last_test_2', 0),
-            'last_test_3': student.get('last_test_3', 0),
-            'last_3_tests_avg': student['last_3_tests_avg'],
-            'previous_3_tests_avg': student['previous_3_tests_avg'],
-            'risk_analysis': risk_result,
-            'intervention_notes': student_notes
-        }
-        
-        return jsonify(response)
+        response['intervention_notes'] = list(notes.get(student_id, []))
+        return json_response(response)
         
     except Exception as e:
-        return jsonify({'error': f'Error fetching student details: {str(e)}'}), 500
+        return json_response({'error': f'Error fetching student details: {str(e)}'}, 500)
 
 @app.route('/api/student/<student_id>/note', methods=['POST'])
 def add_student_note(student_id):
@@ -254,23 +445,23 @@ def add_student_note(student_id):
         return jsonify({'error': 'Note text is required'}), 400
     
     try:
-        # Load existing notes
-        notes = load_student_notes()
-        
-        # Add new note
-        if student_id not in notes:
-            notes[student_id] = []
-        
         new_note = {
             'timestamp': datetime.now().isoformat(),
             'mentor_id': session['user_id'],
             'note': note_text
         }
         
-        notes[student_id].append(new_note)
-        
-        # Save notes
-        save_student_notes(notes)
+        # Hold the lock across load -> append -> save so concurrent notes
+        # are never lost, and work on copies so a failed save leaves the
+        # cached notes untouched
+        with _notes_lock:
+            notes = dict(load_student_notes())
+            student_notes = copy.deepcopy(notes.get(student_id, []))
+            student_notes.append(new_note)
+            notes[student_id] = student_notes
+            
+            # Save notes
+            save_student_notes(notes)
         
         return jsonify({
             'message': 'Note added successfully',
@@ -284,34 +475,28 @@ def add_student_note(student_id):
 def get_summary():
     """Get summary statistics for admin dashboard"""
     if 'user_id' not in session:
-        return jsonify({'error': 'Unauthorized'}), 401
+        return json_response({'error': 'Unauthorized'}, 401)
     
-    global students_data
-    if students_data is None:
-        return jsonify({'error': 'No student data loaded'}), 400
+    dataset = students
+    if dataset is None:
+        return json_response({'error': 'No student data loaded'}, 400)
+    students_data = dataset.data
     
     try:
-        # Calculate risk for all students
+        # Count the precomputed risk levels
         risk_counts = {'Low': 0, 'Medium': 0, 'High': 0}
-        attendance_stats = []
-        score_trends = []
+        levels, counts = np.unique(dataset.arrays['risk_level'], return_counts=True)
+        risk_counts.update({str(level): int(count) for level, count in zip(levels, counts)})
         
-        for _, row in students_data.iterrows():
-            risk_result = risk_calc.calculate_risk(row.to_dict())
-            risk_counts[risk_result['risk_level']] += 1
-            
-            attendance_stats.append({
-                'student_id': row['student_id'],
-                'attendance': row['attendance_percent']
-            })
-            
-            score_trends.append({
-                'student_id': row['student_id'],
-                'previous_avg': row['previous_3_tests_avg'],
-                'current_avg': row['last_3_tests_avg']
-            })
+        attendance_stats = students_data[['student_id', 'attendance_percent']].rename(
+            columns={'attendance_percent': 'attendance'}
+        ).to_dict(orient='records')
         
-        return jsonify({
+        score_trends = students_data[['student_id', 'previous_3_tests_avg', 'last_3_tests_avg']].rename(
+            columns={'previous_3_tests_avg': 'previous_avg', 'last_3_tests_avg': 'current_avg'}
+        ).to_dict(orient='records')
+        
+        return json_response({
             'total_students': len(students_data),
             'risk_distribution': risk_counts,
             'attendance_stats': attendance_stats,
@@ -320,9 +505,15 @@ def get_summary():
         })
         
     except Exception as e:
-        return jsonify({'error': f'Error generating summary: {str(e)}'}), 500
+        return json_response({'error': f'Error generating summary: {str(e)}'}, 500)
 
 if __name__ == '__main__':
+    # Flask's debug server is for development only; production runs under
+    # gunicorn with the settings in gunicorn.conf.py
+    if os.environ.get('FLASK_ENV') != 'dev':
+        sys.exit('Set FLASK_ENV=dev to use the development server, '
+                 'or run: gunicorn -c gunicorn.conf.py app:app')
+    
     # Create necessary directories
     os.makedirs('data', exist_ok=True)
     os.makedirs('static/uploads', exist_ok=True)
@@ -331,5 +522,4 @@ if __name__ == '__main__':
     # Load sample data on startup
     load_sample_data()
     
-    # Run Flask app
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
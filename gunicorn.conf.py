@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for the Dropout Prediction System
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Student data is kept in process memory, so each worker holds its own copy
+# and a CSV upload only reaches the worker that handled it. Run a single
+# worker by default and scale with threads; raise GUNICORN_WORKERS once the
+# data lives in shared storage.
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', multiprocessing.cpu_count() * 2 + 1))
+
+timeout = 60
+accesslog = '-'
+
+
+def post_worker_init(worker):
+    """Load the sample data in each worker, as app.py's __main__ does for the dev server"""
+    from app import load_sample_data
+    load_sample_data()
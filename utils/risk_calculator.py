@@ -3,7 +3,114 @@ Risk Calculator for Student Dropout Prediction
 Implements the heuristic-based risk scoring algorithm
 """
 
+import operator
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    # Fall back to plain Python when numba is not installed
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Student fields read by the risk formula
+RISK_INPUT_COLUMNS = (
+    'attendance_percent', 'fees_due_days', 'attempts_in_subject_X',
+    'previous_3_tests_avg', 'last_3_tests_avg'
+)
+
+# Risk level names indexed by the level codes returned from _risk_core_batch
+RISK_LEVELS = ('Low', 'Medium', 'High')
+
+
+@njit(cache=True, nogil=True)
+def _risk_core(attendance, fees_due, attempts, previous_avg, current_avg,
+               w_attendance, w_score_trend, w_fees, w_attempts):
+    """
+    Compiled risk formula for a single student
+    Returns (attendance_risk, score_risk, fee_risk, attempts_risk, risk_score)
+    """
+    attendance_risk = 0.0
+    if attendance < 75:
+        attendance_risk = (75 - attendance) / 75
+
+    score_risk = 0.0
+    if previous_avg != 0 and current_avg != 0:
+        score_drop = previous_avg - current_avg
+        if score_drop > 0:
+            score_risk = min(score_drop / 100, 1.0)
+
+    fee_risk = min(fees_due / 90, 1.0)
+
+    attempts_risk = 0.0
+    if attempts > 1:
+        attempts_risk = min((attempts - 1) / 4, 1.0)
+
+    risk_score = (
+        w_attendance * attendance_risk +
+        w_score_trend * score_risk +
+        w_fees * fee_risk +
+        w_attempts * attempts_risk
+    )
+
+    return attendance_risk, score_risk, fee_risk, attempts_risk, risk_score
+
+
+# Serial on purpose: numba's parallel workqueue layer aborts when two threads
+# enter a parallel kernel at once, as concurrent uploads under gthread would
+@njit(cache=True, nogil=True)
+def _risk_core_batch(attendance, fees_due, attempts, previous_avg, current_avg,
+                     w_attendance, w_score_trend, w_fees, w_attempts, thr_high, thr_medium):
+    """
+    Compiled risk formula over whole columns
+    Returns (risk_scores, level_codes) arrays, level codes index RISK_LEVELS
+    """
+    n = attendance.shape[0]
+    risk_scores = np.empty(n, dtype=np.float64)
+    level_codes = np.empty(n, dtype=np.int8)
+    for i in range(n):
+        risk_score = _risk_core(
+            attendance[i], fees_due[i], attempts[i], previous_avg[i], current_avg[i],
+            w_attendance, w_score_trend, w_fees, w_attempts
+        )[4]
+        risk_scores[i] = risk_score
+        if risk_score >= thr_high:
+            level_codes[i] = 2
+        elif risk_score >= thr_medium:
+            level_codes[i] = 1
+        else:
+            level_codes[i] = 0
+    return risk_scores, level_codes
+
+
 class RiskCalculator:
+    # Recommendation lookup per risk factor:
+    # (factor, value extractor, comparison, [(threshold, message), ...], fallback message)
+    # Extractors take the (attendance, fees_due, attempts, previous_avg, current_avg)
+    # tuple returned by _coerce
+    _REC_TABLE = (
+        ('Attendance', lambda v: v[0], operator.lt, [
+            (50, "URGENT: Schedule immediate parent-teacher meeting and attendance counseling"),
+            (65, "Schedule one-on-one attendance counseling session"),
+        ], "Monitor attendance closely and provide gentle reminders"),
+        ('Test Score Trend', lambda v: v[3] - v[4], operator.gt, [
+            (15, "Arrange remedial classes and peer tutoring support"),
+            (8, "Provide additional study materials and practice sessions"),
+        ], "Regular check-ins on study habits and academic support"),
+        ('Fee Payment', lambda v: v[1], operator.gt, [
+            (90, "Connect with financial aid office for payment plan options"),
+        ], "Send fee payment reminder and discuss any financial difficulties"),
+        ('Subject Attempts', lambda v: v[2], operator.ge, [
+            (4, "Consider alternative learning methods or course modification"),
+        ], "Provide focused support for challenging subject areas"),
+    )
+
     def __init__(self):
         """Initialize risk calculator with weights and thresholds"""
         # Risk component weights
@@ -20,6 +127,17 @@ class RiskCalculator:
             'medium': 0.40
         }
         
+        # Weights and thresholds hoisted out of the dicts for the hot paths,
+        # in the argument order of the compiled kernels
+        self._w = np.array([
+            self.weights['attendance'], self.weights['score_trend'],
+            self.weights['fees'], self.weights['attempts']
+        ])
+        self._thr_hi = float(self.thresholds['high'])
+        self._thr_med = float(self.thresholds['medium'])
+        self._wt = tuple(self._w.tolist())
+        self._kernel_args = (*self._wt, self._thr_hi, self._thr_med)
+        
         # Color coding for UI
         self.colors = {
             'High': 'danger',    # Red
@@ -66,6 +184,48 @@ class RiskCalculator:
             return 0.0
         return min((attempts - 1) / 4, 1.0)
 
+    def _coerce(self, student_data):
+        """
+        Extract (attendance, fees_due, attempts, previous_avg, current_avg)
+        Rows from df.itertuples() already carry their column dtypes and are
+        read as-is; mappings such as parsed JSON are cast once here
+        """
+        if hasattr(student_data, '_fields'):
+            return (
+                getattr(student_data, 'attendance_percent', 0),
+                getattr(student_data, 'fees_due_days', 0),
+                getattr(student_data, 'attempts_in_subject_X', 1),
+                getattr(student_data, 'previous_3_tests_avg', 0),
+                getattr(student_data, 'last_3_tests_avg', 0)
+            )
+        if isinstance(student_data, tuple):
+            raise TypeError('student_data must be a mapping or a df.itertuples() row, not a plain tuple')
+        return (
+            float(student_data.get('attendance_percent', 0)),
+            int(student_data.get('fees_due_days', 0)),
+            int(student_data.get('attempts_in_subject_X', 1)),
+            float(student_data.get('previous_3_tests_avg', 0)),
+            float(student_data.get('last_3_tests_avg', 0))
+        )
+
+    def _components(self, attendance, fees_due, attempts, previous_avg, current_avg):
+        """
+        Shared risk arithmetic for calculate_risk and calculate_detailed_risk
+        Returns (attendance_risk, score_risk, fee_risk, attempts_risk, risk_score)
+        """
+        return _risk_core(
+            attendance, fees_due, attempts, previous_avg, current_avg,
+            *self._wt
+        )
+
+    def _risk_level(self, risk_score):
+        """Map a risk score onto its risk level"""
+        if risk_score >= self._thr_hi:
+            return 'High'
+        if risk_score >= self._thr_med:
+            return 'Medium'
+        return 'Low'
+
     def calculate_risk(self, student_data):
         """
         Calculate overall risk score for a student
@@ -73,40 +233,12 @@ class RiskCalculator:
         """
         try:
             # Extract required fields with defaults
-            attendance = float(student_data.get('attendance_percent', 0))
-            fees_due = int(student_data.get('fees_due_days', 0))
-            attempts = int(student_data.get('attempts_in_subject_X', 1))
-            previous_avg = float(student_data.get('previous_3_tests_avg', 0))
-            current_avg = float(student_data.get('last_3_tests_avg', 0))
-            
-            # Calculate individual risk components
-            attendance_risk = self.calculate_attendance_risk(attendance)
-            score_risk = self.calculate_score_trend_risk(previous_avg, current_avg)
-            fee_risk = self.calculate_fee_risk(fees_due)
-            attempts_risk = self.calculate_attempts_risk(attempts)
+            attendance, fees_due, attempts, previous_avg, current_avg = self._coerce(student_data)
             
-            # Calculate weighted overall risk score
-            risk_score = (
-                self.weights['attendance'] * attendance_risk +
-                self.weights['score_trend'] * score_risk +
-                self.weights['fees'] * fee_risk +
-                self.weights['attempts'] * attempts_risk
+            return self.calculate_risk_from_values(
+                attendance, fees_due, attempts, previous_avg, current_avg
             )
             
-            # Determine risk level
-            if risk_score >= self.thresholds['high']:
-                risk_level = 'High'
-            elif risk_score >= self.thresholds['medium']:
-                risk_level = 'Medium'
-            else:
-                risk_level = 'Low'
-            
-            return {
-                'risk_score': risk_score,
-                'risk_level': risk_level,
-                'risk_color': self.colors[risk_level]
-            }
-            
         except (ValueError, TypeError) as e:
             # Return safe defaults for malformed data
             return {
@@ -116,6 +248,89 @@ class RiskCalculator:
                 'error': f'Data processing error: {str(e)}'
             }
 
+    def calculate_risk_from_values(self, attendance, fees_due, attempts, previous_avg, current_avg):
+        """
+        Calculate overall risk score from already-typed positional values
+        Lets row loops over df.itertuples() skip building a dict per row
+        """
+        risk_score = self._components(
+            attendance, fees_due, attempts, previous_avg, current_avg
+        )[4]
+        risk_level = self._risk_level(risk_score)
+        
+        return {
+            'risk_score': risk_score,
+            'risk_level': risk_level,
+            'risk_color': self.colors[risk_level]
+        }
+
+    def calculate_risk_vectorized(self, columns):
+        """
+        Calculate risk for every student at once
+        Takes a DataFrame or a dict of column arrays and applies the same
+        formulas as calculate_risk on whole columns
+        Returns dict of arrays: risk_score, risk_level, risk_color
+        """
+        lengths = [len(columns[name]) for name in RISK_INPUT_COLUMNS if name in columns]
+        n = lengths[0] if lengths else 0
+
+        def column(name, default):
+            if name not in columns:
+                return np.full(n, default, dtype=np.float64)
+            # Numeric arrays are used as-is, without a float64 copy
+            return np.asarray(columns[name])
+
+        attendance = column('attendance_percent', 0)
+        fees_due = column('fees_due_days', 0)
+        attempts = column('attempts_in_subject_X', 1)
+        previous_avg = column('previous_3_tests_avg', 0)
+        current_avg = column('last_3_tests_avg', 0)
+
+        # Both paths stay in compiled code or NumPy ufuncs with no per-row
+        # Python work; this runs once per data load, and the compiled kernel
+        # releases the GIL so other request threads keep being served
+        if NUMBA_AVAILABLE:
+            risk_score, level_codes = _risk_core_batch(
+                attendance, fees_due, attempts, previous_avg, current_avg,
+                *self._kernel_args
+            )
+        else:
+            # Calculate individual risk components, using the same comparisons
+            # as _risk_core so a NaN input (blank cell) scores identically
+            attendance_risk = np.where(attendance < 75, (75.0 - attendance) / 75.0, 0.0)
+
+            score_drop = previous_avg - current_avg
+            score_risk = np.where(
+                (previous_avg != 0) & (current_avg != 0) & (score_drop > 0),
+                np.minimum(score_drop / 100.0, 1.0),
+                0.0
+            )
+
+            fee_risk = np.minimum(fees_due / 90.0, 1.0)
+            attempts_risk = np.where(attempts > 1, np.minimum((attempts - 1) / 4.0, 1.0), 0.0)
+
+            # Calculate weighted overall risk score
+            w_attendance, w_score_trend, w_fees, w_attempts = self._wt
+            risk_score = (
+                w_attendance * attendance_risk +
+                w_score_trend * score_risk +
+                w_fees * fee_risk +
+                w_attempts * attempts_risk
+            )
+
+            # Level codes index RISK_LEVELS: 0 Low, 1 Medium, 2 High
+            level_codes = (risk_score >= self._thr_med).astype(np.int8) + (risk_score >= self._thr_hi)
+
+        # Map level codes onto names and colors with a single gather each
+        risk_level = np.array(RISK_LEVELS)[level_codes]
+        risk_color = np.array([self.colors[level] for level in RISK_LEVELS])[level_codes]
+
+        return {
+            'risk_score': risk_score,
+            'risk_level': risk_level,
+            'risk_color': risk_color
+        }
+
     def calculate_detailed_risk(self, student_data):
         """
         Calculate detailed risk analysis with explanations and recommendations
@@ -123,33 +338,14 @@ class RiskCalculator:
         """
         try:
             # Extract student data
-            attendance = float(student_data.get('attendance_percent', 0))
-            fees_due = int(student_data.get('fees_due_days', 0))
-            attempts = int(student_data.get('attempts_in_subject_X', 1))
-            previous_avg = float(student_data.get('previous_3_tests_avg', 0))
-            current_avg = float(student_data.get('last_3_tests_avg', 0))
-            
-            # Calculate individual components
-            attendance_risk = self.calculate_attendance_risk(attendance)
-            score_risk = self.calculate_score_trend_risk(previous_avg, current_avg)
-            fee_risk = self.calculate_fee_risk(fees_due)
-            attempts_risk = self.calculate_attempts_risk(attempts)
+            attendance, fees_due, attempts, previous_avg, current_avg = self._coerce(student_data)
             
-            # Calculate overall risk
-            risk_score = (
-                self.weights['attendance'] * attendance_risk +
-                self.weights['score_trend'] * score_risk +
-                self.weights['fees'] * fee_risk +
-                self.weights['attempts'] * attempts_risk
+            # Calculate individual components and overall risk
+            attendance_risk, score_risk, fee_risk, attempts_risk, risk_score = self._components(
+                attendance, fees_due, attempts, previous_avg, current_avg
             )
-            
-            # Determine risk level
-            if risk_score >= self.thresholds['high']:
-                risk_level = 'High'
-            elif risk_score >= self.thresholds['medium']:
-                risk_level = 'Medium'
-            else:
-                risk_level = 'Low'
+            risk_level = self._risk_level(risk_score)
+            w_attendance, w_score_trend, w_fees, w_attempts = self._wt
             
             # Generate explanations and reasons
             risk_factors = []
@@ -159,7 +355,7 @@ class RiskCalculator:
                 risk_factors.append({
                     'factor': 'Attendance',
                     'value': f"{attendance}% (below 75%)",
-                    'risk_contribution': attendance_risk * self.weights['attendance'],
+                    'risk_contribution': attendance_risk * w_attendance,
                     'severity': 'High' if attendance < 50 else 'Medium' if attendance < 65 else 'Low'
                 })
             
@@ -169,7 +365,7 @@ class RiskCalculator:
                 risk_factors.append({
                     'factor': 'Test Score Trend',
                     'value': f"Dropped by {score_drop:.1f} points",
-                    'risk_contribution': score_risk * self.weights['score_trend'],
+                    'risk_contribution': score_risk * w_score_trend,
                     'severity': 'High' if score_drop > 15 else 'Medium' if score_drop > 8 else 'Low'
                 })
             
@@ -178,7 +374,7 @@ class RiskCalculator:
                 risk_factors.append({
                     'factor': 'Fee Payment',
                     'value': f"{fees_due} days overdue",
-                    'risk_contribution': fee_risk * self.weights['fees'],
+                    'risk_contribution': fee_risk * w_fees,
                     'severity': 'High' if fees_due > 90 else 'Medium' if fees_due > 30 else 'Low'
                 })
             
@@ -187,7 +383,7 @@ class RiskCalculator:
                 risk_factors.append({
                     'factor': 'Subject Attempts',
                     'value': f"{attempts} attempts",
-                    'risk_contribution': attempts_risk * self.weights['attempts'],
+                    'risk_contribution': attempts_risk * w_attempts,
                     'severity': 'High' if attempts >= 4 else 'Medium' if attempts >= 3 else 'Low'
                 })
             
@@ -198,7 +394,10 @@ class RiskCalculator:
             top_reasons = risk_factors[:2] if len(risk_factors) >= 2 else risk_factors
             
             # Generate recommendations
-            recommendations = self.generate_recommendations(student_data, risk_factors)
+            recommendations = self.generate_recommendations(
+                student_data, risk_factors,
+                values=(attendance, fees_due, attempts, previous_avg, current_avg)
+            )
             
             return {
                 'risk_score': round(risk_score, 3),
@@ -211,10 +410,10 @@ class RiskCalculator:
                     'attempts_risk': round(attempts_risk, 3)
                 },
                 'weighted_components': {
-                    'attendance_weighted': round(attendance_risk * self.weights['attendance'], 3),
-                    'score_trend_weighted': round(score_risk * self.weights['score_trend'], 3),
-                    'fee_weighted': round(fee_risk * self.weights['fees'], 3),
-                    'attempts_weighted': round(attempts_risk * self.weights['attempts'], 3)
+                    'attendance_weighted': round(attendance_risk * w_attendance, 3),
+                    'score_trend_weighted': round(score_risk * w_score_trend, 3),
+                    'fee_weighted': round(fee_risk * w_fees, 3),
+                    'attempts_weighted': round(attempts_risk * w_attempts, 3)
                 },
                 'risk_factors': risk_factors,
                 'top_reasons': top_reasons,
@@ -232,44 +431,25 @@ class RiskCalculator:
                 'recommendations': []
             }
 
-    def generate_recommendations(self, student_data, risk_factors):
-        """Generate intervention recommendations based on risk factors"""
+    def generate_recommendations(self, student_data, risk_factors, values=None):
+        """
+        Generate intervention recommendations based on risk factors
+        values, when given, is the tuple _coerce already returned for student_data
+        """
         recommendations = []
         
         # Get primary risk factors
         primary_risks = [f['factor'] for f in risk_factors if f['severity'] in ['High', 'Medium']]
         
-        if 'Attendance' in primary_risks:
-            attendance = float(student_data.get('attendance_percent', 0))
-            if attendance < 50:
-                recommendations.append("URGENT: Schedule immediate parent-teacher meeting and attendance counseling")
-            elif attendance < 65:
-                recommendations.append("Schedule one-on-one attendance counseling session")
-            else:
-                recommendations.append("Monitor attendance closely and provide gentle reminders")
-        
-        if 'Test Score Trend' in primary_risks:
-            score_drop = float(student_data.get('previous_3_tests_avg', 0)) - float(student_data.get('last_3_tests_avg', 0))
-            if score_drop > 15:
-                recommendations.append("Arrange remedial classes and peer tutoring support")
-            elif score_drop > 8:
-                recommendations.append("Provide additional study materials and practice sessions")
-            else:
-                recommendations.append("Regular check-ins on study habits and academic support")
-        
-        if 'Fee Payment' in primary_risks:
-            fees_due = int(student_data.get('fees_due_days', 0))
-            if fees_due > 90:
-                recommendations.append("Connect with financial aid office for payment plan options")
-            else:
-                recommendations.append("Send fee payment reminder and discuss any financial difficulties")
-        
-        if 'Subject Attempts' in primary_risks:
-            attempts = int(student_data.get('attempts_in_subject_X', 1))
-            if attempts >= 4:
-                recommendations.append("Consider alternative learning methods or course modification")
-            else:
-                recommendations.append("Provide focused support for challenging subject areas")
+        # Walk the table in its fixed order, picking the first band the value falls in
+        if values is None:
+            values = self._coerce(student_data)
+        for factor, value_of, compare, bands, fallback in self._REC_TABLE:
+            if factor in primary_risks:
+                value = value_of(values)
+                recommendations.append(
+                    next((message for threshold, message in bands if compare(value, threshold)), fallback)
+                )
         
         # Add general recommendations based on risk level
         overall_risk = len([f for f in risk_factors if f['severity'] == 'High'])